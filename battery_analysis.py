@@ -5,15 +5,50 @@
 # Theme: Sustainable AI & Green Tech
 # ============================================================
 
+import argparse
+import os
+from dataclasses import dataclass
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import os
+from numba import njit
 
 # ============================================================
 # STEP 1 — Load NASA Battery Dataset
 # ============================================================
 
+BATTERY_COLUMNS = ['time', 'voltage', 'current', 'temperature', 'capacity']
+
+
+@dataclass(eq=False)
+class BatterySignals:
+    """
+    Battery signals as raw NumPy arrays, one per column: time in float64,
+    sensor readings in float32. The analysis and plotting steps work on
+    these directly.
+    """
+    time: np.ndarray
+    voltage: np.ndarray
+    current: np.ndarray
+    temperature: np.ndarray
+    capacity: np.ndarray = None       # Optional, not in every dataset
+    
+    def __len__(self):
+        return len(self.time)
+    
+    @classmethod
+    def from_dataframe(cls, data):
+        """Extract the BMS columns of a DataFrame (time float64, rest float32)."""
+        missing = [col for col in BATTERY_COLUMNS
+                   if col != 'capacity' and col not in data.columns]
+        if missing:
+            raise ValueError(f"Battery data is missing required column(s): {missing}")
+        
+        columns = {col: data[col].to_numpy(dtype=np.float64 if col == 'time' else np.float32)
+                   for col in BATTERY_COLUMNS if col in data.columns}
+        return cls(**columns)
+
+
 def load_battery_data(filepath):
     """
     Load NASA battery dataset CSV file.
@@ -21,7 +56,18 @@ def load_battery_data(filepath):
     Files: B0005.csv, B0006.csv, B0007.csv
     """
     print("Loading NASA Battery Dataset...")
-    data = pd.read_csv(filepath)
+    
+    # Only parse the columns the BMS pipeline uses: sensor signals as
+    # float32, time as float64 so large timestamps keep their resolution
+    header = pd.read_csv(filepath, nrows=0).columns
+    usecols = [col for col in BATTERY_COLUMNS if col in header]
+    dtype = {col: np.float64 if col == 'time' else np.float32 for col in usecols}
+    try:
+        data = pd.read_csv(filepath, usecols=usecols, dtype=dtype, engine='pyarrow')
+    except (ImportError, ValueError):
+        # pyarrow not installed or unsupported option — use default parser
+        data = pd.read_csv(filepath, usecols=usecols, dtype=dtype)
+    
     print(f"Dataset loaded: {data.shape[0]} rows, {data.shape[1]} columns")
     print(f"Columns: {list(data.columns)}")
     return data
@@ -38,35 +84,55 @@ def simulate_battery_data(cycles=100):
     Simulates voltage, current, temperature over multiple cycles.
     """
     print("Simulating battery discharge data...")
-    np.random.seed(42)
     
     time_steps = cycles * 100
-    time = np.linspace(0, cycles * 10, time_steps)
+    time = np.linspace(0, cycles * 10, time_steps)    # float64 timestamps
+    
+    # Sensor noise for voltage, current and temperature in one batch
+    rng = np.random.default_rng(42)
+    noise = rng.standard_normal((3, time_steps), dtype=np.float32)
+    noise[0] *= 0.01
+    noise[1] *= 0.05
+    noise[2] *= 0.5
+    
+    w = 2 * np.pi * time
+    buf = np.empty(time_steps, dtype=np.float32)  # Reused scratch buffer
     
     # Simulate voltage degradation over cycles
-    voltage = (4.2 - 0.005 * time + 
-               0.3 * np.sin(2 * np.pi * time / 10) + 
-               np.random.normal(0, 0.01, time_steps))
+    voltage = noise[0]
+    np.sin(np.divide(w, 10, out=buf), out=buf)
+    voltage += 4.2
+    voltage += np.multiply(buf, 0.3, out=buf)
+    voltage -= np.multiply(time, 0.005, out=buf)
     
     # Simulate current draw
-    current = (1.5 + 0.2 * np.sin(2 * np.pi * time / 7) + 
-               np.random.normal(0, 0.05, time_steps))
+    current = noise[1]
+    np.sin(np.divide(w, 7, out=buf), out=buf)
+    current += 1.5
+    current += np.multiply(buf, 0.2, out=buf)
     
     # Simulate temperature
-    temperature = (25 + 5 * np.sin(2 * np.pi * time / 15) + 
-                   0.02 * time + 
-                   np.random.normal(0, 0.5, time_steps))
+    temperature = noise[2]
+    np.sin(np.divide(w, 15, out=buf), out=buf)
+    temperature += 25
+    temperature += np.multiply(buf, 5, out=buf)
+    temperature += np.multiply(time, 0.02, out=buf)
     
     # Simulate capacity degradation (SOH)
-    capacity = 2.0 * (1 - 0.002 * np.arange(time_steps) / 100)
-    
-    data = pd.DataFrame({
-        'time': time,
-        'voltage': np.clip(voltage, 2.5, 4.2),
-        'current': np.clip(current, 0, 3.0),
-        'temperature': temperature,
-        'capacity': np.clip(capacity, 0.5, 2.0)
-    })
+    capacity = 2.0 * (1 - 0.002 * np.arange(time_steps, dtype=np.float32) / 100)
+    
+    # Clip in place, no DataFrame copy
+    np.clip(voltage, 2.5, 4.2, out=voltage)
+    np.clip(current, 0, 3.0, out=current)
+    np.clip(capacity, 0.5, 2.0, out=capacity)
+    
+    data = BatterySignals(
+        time=time,
+        voltage=voltage,
+        current=current,
+        temperature=temperature,
+        capacity=capacity
+    )
     
     print(f"Simulated {time_steps} data points across {cycles} cycles")
     return data
@@ -77,20 +143,48 @@ def simulate_battery_data(cycles=100):
 # Method: Coulomb Counting
 # ============================================================
 
-def calculate_soc(data, initial_capacity=2.0, initial_soc=100.0):
+def time_step(t):
+    """
+    Time step between consecutive samples, with 0 for the first sample.
+    Computed once and shared by the SOC and thermal passes.
+    Pass float64 timestamps: float32 cannot resolve steps on large times.
+    """
+    return np.diff(t, prepend=t[0])
+
+
+@njit(cache=True)
+def _soc_kernel(dt, i, initial_capacity, initial_soc, out):
+    """
+    Single streaming pass of Coulomb Counting over dt[] and current[].
+    Fuses multiply, cumsum, scale and clip into one loop.
+    Missing (non-finite) samples are skipped, like pandas' skipna.
+    """
+    scale = 100.0 / (initial_capacity * 3600.0)
+    acc = np.float64(0.0)                         # float64 accumulator, no drift
+    for k in range(dt.shape[0]):
+        charge = i[k] * dt[k]
+        if np.isfinite(charge):
+            acc += charge
+        s = initial_soc - acc * scale
+        out[k] = 0.0 if s < 0.0 else 100.0 if s > 100.0 else s
+    return out
+
+
+def calculate_soc(data, initial_capacity=2.0, initial_soc=100.0, dt=None):
     """
     Calculate State of Charge using Coulomb Counting method.
     SOC = Initial_SOC - (Integral of current over time / Capacity) * 100
+    Pass a precomputed dt (see time_step) to skip recomputing it.
     """
     print("\nCalculating State of Charge (SOC)...")
     
-    dt = data['time'].diff().fillna(0)           # Time step
-    charge_used = (data['current'] * dt).cumsum()  # Cumulative charge
-    soc = initial_soc - (charge_used / (initial_capacity * 3600)) * 100
-    soc = np.clip(soc, 0, 100)                    # Keep SOC between 0-100%
+    if dt is None:
+        dt = time_step(data.time)
+    soc = np.empty(len(dt), dtype=np.float32)     # SOC kept between 0-100%
+    _soc_kernel(dt, data.current, float(initial_capacity), float(initial_soc), soc)
     
-    print(f"Initial SOC: {soc.iloc[0]:.2f}%")
-    print(f"Final SOC:   {soc.iloc[-1]:.2f}%")
+    print(f"Initial SOC: {soc[0]:.2f}%")
+    print(f"Final SOC:   {soc[-1]:.2f}%")
     return soc
 
 
@@ -106,42 +200,150 @@ def calculate_soh(data, initial_capacity=2.0):
     """
     print("\nCalculating State of Health (SOH)...")
     
-    current_capacity = data['capacity'] if 'capacity' in data.columns else \
-                       pd.Series([initial_capacity] * len(data))
+    if data.capacity is not None:
+        current_capacity = data.capacity
+    else:
+        current_capacity = np.full(len(data), initial_capacity, dtype=np.float32)
     
-    soh = (current_capacity / initial_capacity) * 100
-    soh = np.clip(soh, 0, 100)
+    soh = np.clip(current_capacity * (100.0 / initial_capacity), 0, 100)
     
-    print(f"Initial SOH: {soh.iloc[0]:.2f}%")
-    print(f"Final SOH:   {soh.iloc[-1]:.2f}%")
+    print(f"Initial SOH: {soh[0]:.2f}%")
+    print(f"Final SOH:   {soh[-1]:.2f}%")
     return soh
 
 
+# ============================================================
+# STEP 4B — Joint SOC + SOH Estimation
+# Method: Extended Kalman Filter (voltage + current fusion)
+# ============================================================
+
+# Open-circuit voltage (OCV) vs SOC curve for a typical Li-ion cell
+OCV_SOC_POINTS = np.linspace(0.0, 100.0, 11)
+OCV_VOLTAGE_POINTS = np.array([3.00, 3.45, 3.55, 3.62, 3.68, 3.74,
+                               3.80, 3.87, 3.95, 4.05, 4.20])
+
+# OCV curve and its slope tabulated once at 0.1% SOC resolution,
+# so the EKF loop does a table fetch instead of interpolating
+OCV_LUT_STEPS = 10                                # LUT entries per 1% SOC
+OCV_LUT = np.interp(np.linspace(0.0, 100.0, 100 * OCV_LUT_STEPS + 1),
+                    OCV_SOC_POINTS, OCV_VOLTAGE_POINTS)
+OCV_SLOPE_LUT = np.gradient(OCV_LUT, 1.0 / OCV_LUT_STEPS)
+
+
+@njit(cache=True)
+def _ekf_kernel(dt, i, v, ocv_lut, slope_lut, lut_steps, initial_soc,
+                initial_capacity, capacity_var, r0, q_soc, q_cap, r,
+                soc_out, cap_out):
+    """
+    One recursive sweep of a 2-state EKF, x = [SOC (%), capacity (Ah)].
+    Predict: SOC -= i*dt / (capacity*3600) * 100, capacity constant
+    Update:  measured voltage against OCV(SOC) - i*R0, OCV from ocv_lut
+    The 2x2 covariance and Kalman gain are written out in closed form.
+    Missing (non-finite) samples skip the predict and/or update step.
+    """
+    soc = initial_soc
+    cap = initial_capacity
+    p00 = 1.0
+    p01 = 0.0
+    p11 = capacity_var
+    last = ocv_lut.shape[0] - 1
+    
+    for k in range(dt.shape[0]):
+        # Predict
+        charge = float(i[k]) * float(dt[k]) * (100.0 / 3600.0)
+        if np.isfinite(charge):
+            soc -= charge / cap
+            f01 = charge / (cap * cap)      # d(SOC)/d(capacity)
+            p00 += 2.0 * f01 * p01 + f01 * f01 * p11 + q_soc
+            p01 += f01 * p11
+            p11 += q_cap
+        
+        # Update with the voltage measurement
+        expected_drop = float(i[k]) * r0
+        if np.isfinite(v[k]) and np.isfinite(expected_drop):
+            idx = int(soc * lut_steps + 0.5)
+            idx = 0 if idx < 0 else last if idx > last else idx
+            ocv = ocv_lut[idx]
+            h = slope_lut[idx]
+            innov = float(v[k]) - (ocv - expected_drop)
+            s = h * h * p00 + r
+            k0 = p00 * h / s
+            k1 = p01 * h / s
+            soc += k0 * innov
+            cap += k1 * innov
+            p11 -= k1 * h * p01
+            p01 -= k0 * h * p01
+            p00 -= k0 * h * p00
+        
+        soc = 0.0 if soc < 0.0 else 100.0 if soc > 100.0 else soc
+        cap = 1e-3 if cap < 1e-3 else cap
+        soc_out[k] = soc
+        cap_out[k] = cap
+    return soc_out, cap_out
+
+
+def calculate_states_ekf(data, initial_capacity=2.0, initial_soc=100.0,
+                         r0=0.05, capacity_var=0.04, q_soc=1e-4, q_cap=1e-8,
+                         r=1e-3, dt=None):
+    """
+    Co-estimate SOC and SOH with an Extended Kalman Filter.
+    Fuses Coulomb Counting (current) with the OCV curve (voltage)
+    in a single pass, so SOC does not drift like open-loop integration.
+    Terminal voltage is modelled as OCV(SOC) - current * r0 (ohms).
+    capacity_var (Ah^2) is the prior variance of initial_capacity; the
+    default (0.2 Ah std) lets the estimate follow realistic capacity fade.
+    Returns (soc, soh) as arrays, SOH = (Estimated Capacity / Initial) * 100
+    """
+    print("\nEstimating SOC + SOH (Extended Kalman Filter)...")
+    
+    if dt is None:
+        dt = time_step(data.time)
+    
+    soc = np.empty(len(data), dtype=np.float32)
+    capacity = np.empty(len(data), dtype=np.float32)
+    _ekf_kernel(dt, data.current, data.voltage, OCV_LUT, OCV_SLOPE_LUT, OCV_LUT_STEPS,
+                float(initial_soc), float(initial_capacity),
+                float(capacity_var), float(r0),
+                float(q_soc), float(q_cap), float(r), soc, capacity)
+    
+    soh = np.clip(capacity * (100.0 / initial_capacity), 0, 100)
+    
+    print(f"Final SOC:   {soc[-1]:.2f}%")
+    print(f"Final SOH:   {soh[-1]:.2f}%")
+    return soc, soh
+
+
 # ============================================================
 # STEP 5 — Thermal Runaway Detection
 # Simulates what Verilog FSM does in FPGA hardware
 # ============================================================
 
-def detect_thermal_runaway(data, threshold_temp=45.0, threshold_rate=2.0):
+def detect_thermal_runaway(temp, dt, threshold_temp=45.0, threshold_rate=2.0):
     """
     Detect thermal runaway conditions.
     Alert if: temperature > threshold OR rate of change > threshold
     This mirrors the Verilog thermal_monitor.v module behavior.
+    Takes temperature and time step (see time_step) as NumPy arrays.
+    Returns (thermal_alert, dT_dt) as bool and float NumPy arrays.
     """
     print("\nRunning Thermal Runaway Detection...")
     
-    temp = data['temperature']
-    dt = data['time'].diff().fillna(1)
-    dT_dt = temp.diff().fillna(0) / dt  # Rate of temperature change
+    temp = np.asarray(temp)
+    dt = np.asarray(dt)
+    dT = np.diff(temp, prepend=temp[0])
+    # Rate of temperature change; 0 where the time step is not positive
+    # or a temperature sample is missing
+    valid = (dt > 0) & np.isfinite(dT)
+    dT_dt = np.where(valid, dT / np.where(valid, dt, 1), 0)
     
     # Thermal runaway conditions
     overtemp = temp > threshold_temp
     rapid_rise = dT_dt > threshold_rate
-    thermal_alert = overtemp | rapid_rise
+    thermal_alert = np.logical_or(overtemp, rapid_rise)
     
-    alert_count = thermal_alert.sum()
+    alert_count = np.count_nonzero(thermal_alert)
     print(f"Thermal alerts detected: {alert_count} time steps")
-    print(f"Max temperature: {temp.max():.2f}°C")
+    print(f"Max temperature: {np.nanmax(temp):.2f}°C")
     print(f"Max dT/dt: {dT_dt.max():.4f}°C/s")
     
     return thermal_alert, dT_dt
@@ -151,11 +353,76 @@ def detect_thermal_runaway(data, threshold_temp=45.0, threshold_rate=2.0):
 # STEP 6 — Visualize Results (Demo Dashboard)
 # ============================================================
 
-def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
+def sensor_stats(data):
+    """
+    Summary sensor statistics, reduced directly on the signal arrays
+    (missing samples are skipped, as pandas does).
+    Shared by the dashboard and the final report.
+    """
+    return {
+        'voltage': np.nanmean(data.voltage, dtype=np.float64),
+        'current': np.nanmean(data.current, dtype=np.float64),
+        'temperature': np.nanmax(data.temperature),
+    }
+
+
+def _interactive():
+    """True if BMS_INTERACTIVE is set to 1/true/yes/on (case-insensitive)."""
+    return os.environ.get('BMS_INTERACTIVE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Series longer than this are reduced before plotting
+DECIMATE_THRESHOLD = 50000
+
+
+def _decimate(arr, max_pts=20000, dtype=np.float32):
+    """
+    Stride-sample arr down to roughly max_pts points for plotting
+    (only above DECIMATE_THRESHOLD samples), as a C-contiguous
+    array so matplotlib need not copy it. Use dtype=np.float64 for time.
+    """
+    arr = np.asarray(arr)
+    step = len(arr) // max_pts if len(arr) > DECIMATE_THRESHOLD else 1
+    return np.ascontiguousarray(arr[::max(1, step)], dtype=dtype)
+
+
+def _envelope(t, y, max_pts=20000):
+    """
+    Min/max envelope of y per bucket for plotting, so short spikes
+    (e.g. over-temperature) survive decimation. Returns (t, y) at the
+    min and max sample of each bucket, in time order.
+    """
+    t = np.asarray(t)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= DECIMATE_THRESHOLD:
+        idx = np.arange(n)
+    else:
+        k = max(1, n // (max_pts // 2))               # Samples per bucket
+        n_buckets = n // k
+        buckets = y[:n_buckets * k].reshape(n_buckets, k)
+        i_min = buckets.argmin(axis=1)
+        i_max = buckets.argmax(axis=1)
+        start = np.arange(n_buckets) * k
+        idx = np.column_stack((start + np.minimum(i_min, i_max),
+                               start + np.maximum(i_min, i_max))).ravel()
+        idx = np.concatenate((idx, np.arange(n_buckets * k, n)))
+    return (np.ascontiguousarray(t[idx], dtype=np.float64),
+            np.ascontiguousarray(y[idx], dtype=np.float32))
+
+
+def plot_battery_health(data, soc, soh, thermal_alert, dT_dt, stats=None):
     """
     Create comprehensive battery health visualization dashboard.
     This is what judges see in the demo video.
     """
+    # Imported here so numeric-only runs skip matplotlib start-up cost;
+    # the backend is left to the caller (the main block picks Agg)
+    import matplotlib.pyplot as plt
+    
+    if stats is None:
+        stats = sensor_stats(data)
+    
     fig, axes = plt.subplots(3, 2, figsize=(14, 10))
     fig.suptitle(
         'CoreX Semiconductors — AI-Powered FPGA Battery Management System\n'
@@ -163,10 +430,13 @@ def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
         fontsize=13, fontweight='bold', color='#cc0000'
     )
     
-    time = data['time']
+    # Large datasets are decimated; thermal alerts stay at full resolution
+    time = _decimate(data.time, dtype=np.float64)
+    soc_pts = _decimate(soc)
+    soh_pts = _decimate(soh)
     
     # Plot 1 — Voltage
-    axes[0, 0].plot(time, data['voltage'], color='blue', linewidth=1.5)
+    axes[0, 0].plot(time, _decimate(data.voltage), color='blue', linewidth=1.5)
     axes[0, 0].set_title('Battery Voltage', fontweight='bold')
     axes[0, 0].set_xlabel('Time (s)')
     axes[0, 0].set_ylabel('Voltage (V)')
@@ -176,45 +446,46 @@ def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
     axes[0, 0].grid(True, alpha=0.3)
     
     # Plot 2 — SOC
-    axes[0, 1].plot(time, soc, color='green', linewidth=1.5)
+    axes[0, 1].plot(time, soc_pts, color='green', linewidth=1.5)
     axes[0, 1].set_title('State of Charge (SOC) — AI Predicted', fontweight='bold')
     axes[0, 1].set_xlabel('Time (s)')
     axes[0, 1].set_ylabel('SOC (%)')
     axes[0, 1].axhline(y=20, color='red', linestyle='--', label='Low Battery (20%)')
-    axes[0, 1].fill_between(time, soc, alpha=0.3, color='green')
+    axes[0, 1].fill_between(time, soc_pts, alpha=0.3, color='green')
     axes[0, 1].legend(fontsize=8)
     axes[0, 1].grid(True, alpha=0.3)
     axes[0, 1].set_ylim(0, 110)
     
     # Plot 3 — SOH
-    axes[1, 0].plot(time, soh, color='orange', linewidth=1.5)
+    axes[1, 0].plot(time, soh_pts, color='orange', linewidth=1.5)
     axes[1, 0].set_title('State of Health (SOH) — AI Predicted', fontweight='bold')
     axes[1, 0].set_xlabel('Time (s)')
     axes[1, 0].set_ylabel('SOH (%)')
     axes[1, 0].axhline(y=80, color='red', linestyle='--', label='Replace Battery (<80%)')
-    axes[1, 0].fill_between(time, soh, alpha=0.3, color='orange')
+    axes[1, 0].fill_between(time, soh_pts, alpha=0.3, color='orange')
     axes[1, 0].legend(fontsize=8)
     axes[1, 0].grid(True, alpha=0.3)
     axes[1, 0].set_ylim(0, 110)
     
-    # Plot 4 — Temperature + Thermal Alert
-    axes[1, 1].plot(time, data['temperature'], color='red', linewidth=1.5, label='Temperature')
+    # Plot 4 — Temperature + Thermal Alert (min/max envelope keeps spikes)
+    temp_time, temp_pts = _envelope(data.time, data.temperature)
+    axes[1, 1].plot(temp_time, temp_pts, color='red', linewidth=1.5, label='Temperature')
     axes[1, 1].set_title('Temperature + Thermal Runaway Detection', fontweight='bold')
     axes[1, 1].set_xlabel('Time (s)')
     axes[1, 1].set_ylabel('Temperature (°C)')
     axes[1, 1].axhline(y=45, color='darkred', linestyle='--', label='Danger Threshold (45°C)')
     
     # Highlight thermal alert zones
-    alert_zones = data['time'][thermal_alert]
-    if len(alert_zones) > 0:
-        axes[1, 1].scatter(alert_zones, 
-                          data['temperature'][thermal_alert],
+    alert_idx = np.flatnonzero(thermal_alert)
+    if len(alert_idx) > 0:
+        axes[1, 1].scatter(data.time[alert_idx], 
+                          data.temperature[alert_idx],
                           color='red', s=10, zorder=5, label='⚠️ Thermal Alert!')
     axes[1, 1].legend(fontsize=8)
     axes[1, 1].grid(True, alpha=0.3)
     
     # Plot 5 — Current
-    axes[2, 0].plot(time, data['current'], color='purple', linewidth=1.5)
+    axes[2, 0].plot(time, _decimate(data.current), color='purple', linewidth=1.5)
     axes[2, 0].set_title('Battery Current', fontweight='bold')
     axes[2, 0].set_xlabel('Time (s)')
     axes[2, 0].set_ylabel('Current (A)')
@@ -222,9 +493,9 @@ def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
     
     # Plot 6 — Summary Dashboard
     axes[2, 1].axis('off')
-    final_soc = soc.iloc[-1]
-    final_soh = soh.iloc[-1]
-    alert_count = thermal_alert.sum()
+    final_soc = soc[-1]
+    final_soh = soh[-1]
+    alert_count = np.count_nonzero(thermal_alert)
     
     soc_color = 'green' if final_soc > 50 else 'orange' if final_soc > 20 else 'red'
     soh_color = 'green' if final_soh > 80 else 'orange' if final_soh > 60 else 'red'
@@ -234,7 +505,7 @@ def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
         f"━━━ LIVE BMS STATUS DASHBOARD ━━━\n\n"
         f"  State of Charge (SOC):  {final_soc:.1f}%\n"
         f"  State of Health (SOH):  {final_soh:.1f}%\n"
-        f"  Max Temperature:  {data['temperature'].max():.1f}°C\n"
+        f"  Max Temperature:  {stats['temperature']:.1f}°C\n"
         f"  Thermal Alerts:  {alert_count} events\n\n"
         f"━━━ FPGA PROTECTION STATUS ━━━\n\n"
         f"  Thermal Monitor:    ACTIVE ✓\n"
@@ -257,29 +528,34 @@ def plot_battery_health(data, soc, soh, thermal_alert, dT_dt):
     plt.tight_layout()
     plt.savefig('battery_health_dashboard.png', dpi=150, bbox_inches='tight')
     print("\nDashboard saved as 'battery_health_dashboard.png'")
-    plt.show()
+    if _interactive():
+        plt.show()
+    plt.close(fig)
 
 
 # ============================================================
 # STEP 7 — Print Final Report
 # ============================================================
 
-def print_final_report(data, soc, soh, thermal_alert):
+def print_final_report(data, soc, soh, thermal_alert, stats=None):
     """Print a clean summary report for demo video."""
+    if stats is None:
+        stats = sensor_stats(data)
+    
     print("\n" + "="*55)
     print("   CoreX Semiconductors — AI-Powered FPGA BMS")
     print("   AMD Slingshot 2026 | Shashank Ganji")
     print("="*55)
     print(f"\n  Dataset Size:      {len(data)} data points")
     print(f"\n  BATTERY STATUS:")
-    print(f"  State of Charge:   {soc.iloc[-1]:.2f}%")
-    print(f"  State of Health:   {soh.iloc[-1]:.2f}%")
+    print(f"  State of Charge:   {soc[-1]:.2f}%")
+    print(f"  State of Health:   {soh[-1]:.2f}%")
     print(f"\n  SENSOR READINGS:")
-    print(f"  Avg Voltage:       {data['voltage'].mean():.3f} V")
-    print(f"  Avg Current:       {data['current'].mean():.3f} A")
-    print(f"  Max Temperature:   {data['temperature'].max():.2f} °C")
+    print(f"  Avg Voltage:       {stats['voltage']:.3f} V")
+    print(f"  Avg Current:       {stats['current']:.3f} A")
+    print(f"  Max Temperature:   {stats['temperature']:.2f} °C")
     print(f"\n  PROTECTION STATUS:")
-    print(f"  Thermal Alerts:    {thermal_alert.sum()} events detected")
+    print(f"  Thermal Alerts:    {np.count_nonzero(thermal_alert)} events detected")
     print(f"  Thermal Monitor:   ACTIVE")
     print(f"  Cell Balancing:    ACTIVE")
     print(f"  Overcurrent Prot:  ACTIVE")
@@ -295,6 +571,13 @@ def print_final_report(data, soc, soh, thermal_alert):
 # ============================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CoreX Semiconductors — AI-Powered FPGA BMS")
+    parser.add_argument('--no-plot', action='store_true',
+                        help="skip rendering the dashboard (headless/CI runs)")
+    parser.add_argument('--ekf', action='store_true',
+                        help="estimate SOC + SOH with the Extended Kalman Filter")
+    args = parser.parse_args()
+    
     print("CoreX Semiconductors — AI-Powered FPGA BMS")
     print("AMD Slingshot 2026 | Shashank Ganji")
     print("-" * 45)
@@ -302,21 +585,35 @@ if __name__ == "__main__":
     # Try to load real NASA dataset, else simulate
     nasa_file = 'B0005.csv'
     if os.path.exists(nasa_file):
-        data = load_battery_data(nasa_file)
+        data = BatterySignals.from_dataframe(load_battery_data(nasa_file))
     else:
         print("NASA dataset not found — using simulated data for demo.")
         print("Download real data from: data.nasa.gov")
         data = simulate_battery_data(cycles=50)
     
+    # Time step shared by SOC and thermal detection
+    dt = time_step(data.time)
+    
     # Calculate SOC and SOH
-    soc = calculate_soc(data)
-    soh = calculate_soh(data)
+    if args.ekf:
+        soc, soh = calculate_states_ekf(data, dt=dt)
+    else:
+        soc = calculate_soc(data, dt=dt)
+        soh = calculate_soh(data)
     
     # Detect thermal runaway
-    thermal_alert, dT_dt = detect_thermal_runaway(data)
+    thermal_alert, dT_dt = detect_thermal_runaway(data.temperature, dt)
+    
+    # Sensor statistics shared by report and dashboard
+    stats = sensor_stats(data)
     
     # Print report
-    print_final_report(data, soc, soh, thermal_alert)
+    print_final_report(data, soc, soh, thermal_alert, stats)
     
     # Plot dashboard
-    plot_battery_health(data, soc, soh, thermal_alert, dT_dt)
+    if not args.no_plot:
+        # Headless Agg backend unless an interactive window is requested
+        if not _interactive():
+            import matplotlib
+            matplotlib.use('Agg')
+        plot_battery_health(data, soc, soh, thermal_alert, dT_dt, stats)
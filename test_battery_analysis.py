@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analysis import (
+    BatterySignals, OCV_SOC_POINTS, OCV_VOLTAGE_POINTS,
+    calculate_soc, calculate_states_ekf, detect_thermal_runaway, sensor_stats,
+    time_step,
+)
+
+
+def test_ekf_converges_on_ocv_consistent_data():
+    # 2 A constant discharge of a 2 Ah cell with an 80 mOhm ohmic drop
+    n = 3000
+    time = np.arange(n, dtype=np.float64)
+    current = np.full(n, 2.0, dtype=np.float32)
+    true_soc = 100.0 - np.cumsum(current * time_step(time)) * 100.0 / (2.0 * 3600.0)
+    voltage = (np.interp(true_soc, OCV_SOC_POINTS, OCV_VOLTAGE_POINTS)
+               - 2.0 * 0.08
+               + np.random.default_rng(0).normal(0, 0.01, n))
+    data = BatterySignals(time=time, voltage=voltage.astype(np.float32),
+                          current=current, temperature=np.full(n, 25.0, dtype=np.float32))
+
+    # Start from a wrong SOC; the filter should lock on to the true one
+    soc, soh = calculate_states_ekf(data, initial_soc=80.0, r0=0.08)
+
+    assert np.abs(soc[500:] - true_soc[500:]).max() < 1.0
+    assert abs(soh[-1] - 100.0) < 2.0
+
+
+def test_ekf_tracks_capacity_fade():
+    # Faded cell: 1.6 Ah left of a 2 Ah nominal capacity (SOH 80%)
+    n = 2700
+    time = np.arange(n, dtype=np.float64)
+    current = np.full(n, 2.0, dtype=np.float32)
+    true_soc = 100.0 - np.cumsum(current * time_step(time)) * 100.0 / (1.6 * 3600.0)
+    voltage = (np.interp(true_soc, OCV_SOC_POINTS, OCV_VOLTAGE_POINTS)
+               - 2.0 * 0.08
+               + np.random.default_rng(0).normal(0, 0.01, n))
+    data = BatterySignals(time=time, voltage=voltage.astype(np.float32),
+                          current=current, temperature=np.full(n, 25.0, dtype=np.float32))
+
+    soc, soh = calculate_states_ekf(data, initial_capacity=2.0, r0=0.08)
+
+    assert abs(soh[-1] - 80.0) < 2.0
+    assert np.abs(soc[500:] - true_soc[500:]).max() < 1.0
+
+
+def test_ekf_survives_missing_samples():
+    n = 100
+    voltage = np.full(n, 3.9, dtype=np.float32)
+    voltage[10] = np.nan
+    current = np.full(n, 1.0, dtype=np.float32)
+    current[20] = np.nan
+    data = BatterySignals(time=np.arange(n, dtype=np.float64), voltage=voltage,
+                          current=current, temperature=np.full(n, 25.0, dtype=np.float32))
+
+    soc, soh = calculate_states_ekf(data)
+
+    assert np.all(np.isfinite(soc)) and np.all(np.isfinite(soh))
+    assert soc[10] > 0 and soc[-1] > 0
+
+
+def test_from_dataframe_keeps_time_float64_and_names_missing_columns():
+    frame = pd.DataFrame({'time': [1.7e9, 1.7e9 + 1.0], 'voltage': [3.7, 3.7],
+                          'current': [1.0, 1.0], 'temperature': [25.0, 25.0]})
+    signals = BatterySignals.from_dataframe(frame)
+    assert signals.time.dtype == np.float64
+    assert signals.capacity is None
+    assert time_step(signals.time)[1] == 1.0
+
+    with pytest.raises(ValueError, match="current"):
+        BatterySignals.from_dataframe(frame.drop(columns=['current']))
+
+
+def test_soc_skips_missing_current_sample():
+    n = 10
+    time = np.arange(n, dtype=np.float64) * 10.0
+    current = np.full(n, 1.0, dtype=np.float32)
+    current[3] = np.nan
+    data = BatterySignals(time=time, voltage=np.full(n, 3.7, dtype=np.float32),
+                          current=current, temperature=np.full(n, 25.0, dtype=np.float32))
+
+    soc = calculate_soc(data)
+
+    # The missing row adds no charge; counting carries on after it
+    step = 10.0 * 100.0 / (2.0 * 3600.0)
+    expected = 100.0 - step * np.array([0, 1, 2, 2, 3, 4, 5, 6, 7, 8])
+    assert np.all(np.isfinite(soc))
+    np.testing.assert_allclose(soc, expected, rtol=1e-5)
+
+
+def test_thermal_detection_ignores_missing_temperature_sample():
+    temp = np.array([25.0, 25.5, np.nan, 26.0, 50.0], dtype=np.float32)
+    dt = time_step(np.arange(5, dtype=np.float64))
+
+    thermal_alert, dT_dt = detect_thermal_runaway(temp, dt)
+
+    assert np.all(np.isfinite(dT_dt))
+    assert dT_dt[2] == 0 and dT_dt[3] == 0
+    assert thermal_alert.tolist() == [False, False, False, False, True]
+
+
+def test_sensor_stats_skip_missing_samples():
+    data = BatterySignals(time=np.arange(3, dtype=np.float64),
+                          voltage=np.array([3.6, 3.8, 3.7], dtype=np.float32),
+                          current=np.array([1.0, np.nan, 1.0], dtype=np.float32),
+                          temperature=np.array([25.0, np.nan, 24.0], dtype=np.float32))
+
+    stats = sensor_stats(data)
+
+    assert stats['current'] == pytest.approx(1.0)
+    assert stats['temperature'] == pytest.approx(25.0)